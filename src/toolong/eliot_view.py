@@ -3,15 +3,56 @@ from __future__ import annotations
 from textual.widgets import Tree
 from textual.widgets.tree import TreeNode
 from rich.text import Text
-from datetime import datetime
+from functools import lru_cache
 import json
-from typing import Dict, Any
+from typing import Any, Sequence
 from textual.binding import Binding
-from textual import on
+from textual import on, work
 from textual.app import ComposeResult
 from textual.containers import Container
+from textual.worker import get_current_worker
 from eliot.parse import Parser, Task, WrittenAction, WrittenMessage
 from pathlib import Path
+from sys import intern
+from time import gmtime
+
+from toolong.json_decode import json_loads
+
+# Fields rendered in a node's label rather than as child fields
+_STANDARD_ACTION_FIELDS = frozenset(
+    {"task_uuid", "task_level", "action_type", "action_status", "timestamp"}
+)
+_STANDARD_MSG_FIELDS = frozenset({"task_uuid", "task_level", "message_type", "timestamp"})
+_STANDARD_FIELDS = _STANDARD_ACTION_FIELDS | _STANDARD_MSG_FIELDS
+_ERROR_FIELDS = frozenset({"exception", "reason", "error", "failure"})
+# Fields with few distinct values, repeated across many messages
+_INTERNED_FIELDS = ("action_type", "message_type", "action_status")
+
+# Number of completed tasks to parse before adding them to the tree
+TASK_BATCH_SIZE = 256
+
+_STATUS_STYLES = {
+    "succeeded": "green",
+    "failed": "red",
+    "started": "yellow",
+}
+
+
+@lru_cache(maxsize=4096)
+def _format_timestamp(seconds: int) -> str:
+    """Format a timestamp (in whole seconds) as UTC, for a node label."""
+    tm = gmtime(seconds)
+    return (
+        f"{tm.tm_year:04d}-{tm.tm_mon:02d}-{tm.tm_mday:02d} "
+        f"{tm.tm_hour:02d}:{tm.tm_min:02d}:{tm.tm_sec:02d}"
+    )
+
+
+@lru_cache(maxsize=1024)
+def _format_task_level(level: Sequence[int]) -> str:
+    """Format a task level, such as `1/2/1`, for a node label."""
+    return "/".join(map(str, level))
+
 
 class EliotTree(Tree):
     """A tree widget for displaying Eliot logs with folding support."""
@@ -31,13 +72,11 @@ class EliotTree(Tree):
     def __init__(self, file_name: str | None = None) -> None:
         super().__init__(file_name or "Eliot Log")
         self._parser = Parser()
-        self._task_nodes: Dict[str, TreeNode] = {}
+        self._task_uuids: set[str] = set()
         self.loading = False
 
     def _format_node_label(self, eliot_node: Task | WrittenAction | WrittenMessage | tuple) -> Text:
         """Format a node's label based on its type."""
-        label = Text()
-        
         if isinstance(eliot_node, Task):
             return Text(eliot_node.root().task_uuid)
             
@@ -45,50 +84,44 @@ class EliotTree(Tree):
             # Get action/message type and task level
             message = eliot_node.start_message if isinstance(eliot_node, WrittenAction) else eliot_node
             action_type = message.contents.get("action_type") or message.contents.get("message_type")
-            task_level = "/".join(str(n) for n in message.task_level.level)
-            
-            # Format the label with single slash
-            label.append(f"{action_type}/{task_level}", style="cyan")
+            task_level = _format_task_level(message.task_level.level)
             
             # Add status and timestamps for actions
             if isinstance(eliot_node, WrittenAction):
-                # Add status
+                end_message = eliot_node.end_message
                 status = "started"
-                if eliot_node.end_message:
-                    status = eliot_node.end_message.contents.get("action_status", "started")
-                status_style = {
-                    "succeeded": "green",
-                    "failed": "red",
-                    "started": "yellow",
-                }.get(status, "white")
-                label.append(" ⇒ ", style="bright_black")
-                label.append(status, style=status_style)
-                
-                # Add timestamp
-                start_time = datetime.fromtimestamp(eliot_node.start_message.timestamp)
-                label.append(f" {start_time:%Y-%m-%d %H:%M:%S}Z", style="blue")
-                
+                if end_message:
+                    status = end_message.contents.get("action_status", "started")
+                start_time = _format_timestamp(int(eliot_node.start_message.timestamp))
                 # Add duration if action is completed
-                if eliot_node.end_message:
-                    duration = eliot_node.end_message.timestamp - eliot_node.start_message.timestamp
-                    label.append(f" ⧖ {duration:.3f}s", style="blue")
-            else:
-                # For regular messages, just add timestamp
-                msg_time = datetime.fromtimestamp(message.timestamp)
-                label.append(f" {msg_time:%Y-%m-%d %H:%M:%S}Z", style="blue")
-            
-            return label
-            
+                duration = (
+                    (f" ⧖ {end_message.timestamp - eliot_node.start_message.timestamp:.3f}s", "blue")
+                    if end_message
+                    else ""
+                )
+                return Text.assemble(
+                    (f"{action_type}/{task_level}", "cyan"),
+                    (" ⇒ ", "bright_black"),
+                    (status, _STATUS_STYLES.get(status, "white")),
+                    (f" {start_time}Z", "blue"),
+                    duration,
+                )
+
+            # For regular messages, just add timestamp
+            msg_time = _format_timestamp(int(message.timestamp))
+            return Text.assemble(
+                (f"{action_type}/{task_level}", "cyan"),
+                (f" {msg_time}Z", "blue"),
+            )
+
         if isinstance(eliot_node, tuple):
             # Field nodes
             key, value = eliot_node
-            if key not in ("task_uuid", "task_level", "action_type", "action_status", "message_type", "timestamp"):
-                label.append(f"{key}: ", style="bright_black")
-                if key in ("exception", "reason", "error", "failure"):
-                    label.append(str(value), style="bright_red")
-                else:
-                    label.append(str(value), style="white")
-                return label
+            if key not in _STANDARD_FIELDS:
+                return Text.assemble(
+                    (f"{key}: ", "bright_black"),
+                    (str(value), "bright_red" if key in _ERROR_FIELDS else "white"),
+                )
                 
         return Text(str(eliot_node))
 
@@ -98,24 +131,27 @@ class EliotTree(Tree):
             return [eliot_node.root()]
             
         if isinstance(eliot_node, WrittenAction):
-            children = []
-            # Add fields from start message
-            for key, value in eliot_node.start_message.contents.items():
-                if key not in ("task_uuid", "task_level", "action_type", "action_status", "timestamp"):
-                    children.append((key, value))
-            # Add child actions/messages
-            children.extend(eliot_node.children)
-            # Add end message fields if present
-            if eliot_node.end_message:
-                for key, value in eliot_node.end_message.contents.items():
-                    if key not in ("task_uuid", "task_level", "action_type", "action_status", "timestamp"):
-                        children.append((key, value))
-            return children
+            # Fields from start message, child actions/messages, then end message fields
+            start_fields = [
+                (key, value)
+                for key, value in eliot_node.start_message.contents.items()
+                if key not in _STANDARD_ACTION_FIELDS
+            ]
+            end_fields = (
+                [
+                    (key, value)
+                    for key, value in eliot_node.end_message.contents.items()
+                    if key not in _STANDARD_ACTION_FIELDS
+                ]
+                if eliot_node.end_message
+                else ()
+            )
+            return [*start_fields, *eliot_node.children, *end_fields]
             
         if isinstance(eliot_node, WrittenMessage):
             # For message nodes, include all fields except the standard ones
             return [(key, value) for key, value in eliot_node.contents.items() 
-                   if key not in ("task_uuid", "task_level", "message_type", "timestamp")]
+                   if key not in _STANDARD_MSG_FIELDS]
 
         if isinstance(eliot_node, tuple):
             key, value = eliot_node
@@ -126,7 +162,7 @@ class EliotTree(Tree):
             # For message nodes in the tree, treat them as having their own fields
             if isinstance(key, str) and key.endswith("_details") and isinstance(value, str):
                 try:
-                    data = json.loads(value)
+                    data = json_loads(value)
                     if isinstance(data, dict):
                         return list(data.items())
                 except (json.JSONDecodeError, AttributeError):
@@ -135,13 +171,14 @@ class EliotTree(Tree):
         return []
 
     def _add_node_to_tree(self, eliot_node: Task | WrittenAction | WrittenMessage | tuple, parent: TreeNode | None = None) -> TreeNode:
-        """Add an Eliot node to the tree with proper structure."""
+        """Add an Eliot node to the tree.
+
+        The node's children are added when it is first expanded, so large
+        tasks don't create tree nodes that may never be seen.
+        """
         label = self._format_node_label(eliot_node)
-        node = (parent or self.root).add(label)
-        
-        # Get children first to check if node should be expandable
-        children = self._get_children(eliot_node)
-        
+        node = (parent or self.root).add(label, data=eliot_node)
+
         # Set expansion properties
         node.allow_expand = (
             isinstance(eliot_node, (Task, WrittenAction)) or
@@ -150,42 +187,88 @@ class EliotTree(Tree):
                 isinstance(eliot_node[1], (dict, list)) or
                 (isinstance(eliot_node[1], str) and isinstance(eliot_node[0], str) and eliot_node[0].endswith("_details"))
             ))
-        ) and bool(children)  # Only allow expand if there are children
-        
-        # Auto-expand failed actions
-        if isinstance(eliot_node, WrittenAction) and eliot_node.end_message:
-            if eliot_node.end_message.contents.get("action_status") == "failed":
-                node.expand()
-                self._expand_failure_path(node)
-        
-        # Add children
-        for child in children:
-            self._add_node_to_tree(child, node)
-            
+        ) and bool(self._get_children(eliot_node))  # Only allow expand if there are children
+
         return node
 
-    def add_log_entry(self, line: str) -> None:
-        """Add a log entry to the tree using Eliot's parser."""
+    def _add_children(self, node: TreeNode) -> None:
+        """Add tree nodes for the children of an Eliot node, if not already added."""
+        if node.children or node.data is None:
+            return
+        with self.app.batch_update():
+            for child in self._get_children(node.data):
+                self._add_node_to_tree(child, node)
+
+    @on(Tree.NodeExpanded)
+    def _on_node_expanded(self, event: Tree.NodeExpanded) -> None:
+        self._add_children(event.node)
+
+    def _get_failure_path(self, task: Task) -> set[int]:
+        """Get the ids of the Eliot nodes which are, or lead to, a failed action."""
+        failure_path: set[int] = set()
+        root = task.root()
+        parents: dict[int, int] = {id(root): id(task)}
+        stack: list[WrittenAction] = [root]
+        while stack:
+            action = stack.pop()
+            if action.end_message and action.end_message.contents.get("action_status") == "failed":
+                node_id: int | None = id(action)
+                while node_id is not None and node_id not in failure_path:
+                    failure_path.add(node_id)
+                    node_id = parents.get(node_id)
+            for child in action.children:
+                if isinstance(child, WrittenAction):
+                    parents[id(child)] = id(action)
+                    stack.append(child)
+        return failure_path
+
+    def _add_task(self, task: Task) -> None:
+        """Add a task to the tree, auto-expanding any failed actions."""
+        task_node = self._add_node_to_tree(task)
+        failure_path = self._get_failure_path(task)
+        if not failure_path:
+            return
+        stack = [task_node]
+        while stack:
+            node = stack.pop()
+            if id(node.data) in failure_path:
+                self._add_children(node)
+                node.expand()
+                stack.extend(node.children)
+        self.root.expand()
+
+    def parse_log_entry(self, line: str) -> list[Task]:
+        """Parse a log entry, and return any tasks it completes.
+
+        This doesn't touch the tree, so may be called from a thread.
+        """
         try:
-            data = json.loads(line)
+            data = json_loads(line)
+            if isinstance(data, dict):
+                # Share one string object per distinct value, to save memory
+                # and make dict lookups on these values cheaper
+                for key in _INTERNED_FIELDS:
+                    value = data.get(key)
+                    if isinstance(value, str):
+                        data[key] = intern(value)
             completed_tasks, self._parser = self._parser.add(data)
-            
-            # Add completed tasks to the tree
-            for task in completed_tasks:
-                if task.root().task_uuid not in self._task_nodes:
-                    node = self._add_node_to_tree(task)
-                    self._task_nodes[task.root().task_uuid] = node
-                    
         except (json.JSONDecodeError, KeyError) as e:
             print(f"Error processing log entry: {e}")
+            return []
+        return completed_tasks
 
-    def _expand_failure_path(self, node: TreeNode) -> None:
-        """Expand all nodes in the path to a failure."""
-        current = node
-        while current and current != self.root:
-            current.expand()
-            current = current.parent
-        self.root.expand()
+    def add_tasks(self, tasks: list[Task]) -> None:
+        """Add completed tasks to the tree."""
+        with self.app.batch_update():
+            for task in tasks:
+                task_uuid = task.root().task_uuid
+                if task_uuid not in self._task_uuids:
+                    self._task_uuids.add(task_uuid)
+                    self._add_task(task)
+
+    def add_log_entry(self, line: str) -> None:
+        """Add a log entry to the tree using Eliot's parser."""
+        self.add_tasks(self.parse_log_entry(line))
 
     def render_node(self, node: TreeNode) -> Text:
         """Render a node with proper formatting."""
@@ -232,14 +315,28 @@ class EliotView(Container):
         self._tree = EliotTree(file_name=file_name)
         yield self._tree
 
-    async def on_mount(self) -> None:
+    def on_mount(self) -> None:
         """Handle widget mount."""
-        # Process existing log entries
+        self._tree.focus()
+        self.load_log_entries()
+
+    @work(thread=True)
+    def load_log_entries(self) -> None:
+        """Read and parse log entries in a thread, adding tasks to the tree in batches."""
+        worker = get_current_worker()
+        tree = self._tree
+        batch: list[Task] = []
         for path in self.file_paths:
             with open(path) as f:
                 for line in f:
+                    if worker.is_cancelled:
+                        return
                     line = line.strip()
-                    self._tree.add_log_entry(line)
-        
-        # Focus the tree
-        self._tree.focus() 
\ No newline at end of file
+                    if not line:
+                        continue
+                    batch.extend(tree.parse_log_entry(line))
+                    if len(batch) >= TASK_BATCH_SIZE:
+                        self.app.call_from_thread(tree.add_tasks, batch)
+                        batch = []
+        if batch:
+            self.app.call_from_thread(tree.add_tasks, batch)
@@ -4,21 +4,52 @@ import json
 import re
 from typing_extensions import TypeAlias
 
-from rich.highlighter import JSONHighlighter
+from rich.highlighter import Highlighter, JSONHighlighter
 import rich.repr
 from rich.text import Text
+from textual.cache import LRUCache
 
 from toolong.highlighter import LogHighlighter
 from toolong import timestamps
 from typing import Optional, Dict, Any
 
+from toolong.json_decode import json_loads
+
+try:
+    # RE2 matches in linear time, with no catastrophic backtracking
+    import re2 as regex_engine
+except ImportError:
+    regex_engine = re
+
 
 ParseResult: TypeAlias = "tuple[Optional[datetime], str, Text]"
 
+# Passed as `parsed` when a line looked like JSON but could not be decoded
+_DECODE_FAILED = object()
+
+
+def highlight_line(line: str, highlighter: Highlighter) -> Text:
+    """Convert a line to Text, applying the highlighter if it has no ANSI styles."""
+    # Decoding ANSI is relatively expensive, and most lines don't contain escape codes
+    if "\x1b" in line or "\r" in line:
+        text = Text.from_ansi(line)
+        return text if text.spans else highlighter(text)
+    return highlighter(Text(line))
+
 
 @rich.repr.auto
 class LogFormat:
-    def parse(self, line: str) -> ParseResult | None:
+    def parse(self, line: str, parsed: Any = None) -> ParseResult | None:
+        """Parse a line.
+
+        Args:
+            line: A log line.
+            parsed: The line decoded as JSON, if already known, `_DECODE_FAILED` if
+                the line is known not to be JSON, or `None`.
+
+        Returns:
+            A parse result, or `None` if the line is not in this format.
+        """
         raise NotImplementedError()
 
 
@@ -31,8 +62,15 @@ HTTP_GROUPS = {
 }
 
 
+# Fields are matched with character classes that stop at their delimiter, so the
+# regexes don't need to backtrack. Patterns avoid lookaround, which RE2 doesn't support.
+COMMON_LOG_PATTERN = r'(?P<ip>\S*) (?P<remote_log_name>\S*) (?P<userid>\S*) (?P<date>\[[^ \]]* [^\]]*\]) "(?P<request_method>[^" ]*) (?P<path>[^"]*?)(?P<request_version> HTTP\/[^"]*)?" (?P<status>\S*) (?P<length>\S*) "(?P<referrer>(?:[^"\\]|\\.)*)"(?: "(?P<user_agent>(?:[^"\\]|\\.)*)")?'
+COMBINED_LOG_PATTERN = r'(?P<ip>\S*) (?P<remote_log_name>\S*) (?P<userid>\S*) \[(?P<date>[^ \]]*) (?P<timezone>[^\]]*)\] "(?P<request_method>[^" ]*) (?P<path>[^"]*?)(?P<request_version> HTTP\/[^"]*)?" (?P<status>\S*) (?P<length>\S*) "(?P<referrer>(?:[^"\\]|\\.)*)" "(?P<user_agent>(?:[^"\\]|\\.)*)" (?P<session_id>\S*) (?P<generation_time_micro>\S*) (?P<virtual_host>.*)'
+
+
 class RegexLogFormat(LogFormat):
-    REGEX = re.compile(".*?")
+    REGEX = regex_engine.compile(".*?")
+    _match = REGEX.fullmatch
     HIGHLIGHT_WORDS = [
         "GET",
         "POST",
@@ -46,60 +84,107 @@ class RegexLogFormat(LogFormat):
 
     highlighter = LogHighlighter()
 
-    def parse(self, line: str) -> ParseResult | None:
-        match = self.REGEX.fullmatch(line)
+    def parse(self, line: str, parsed: Any = None) -> ParseResult | None:
+        match = self._match(line)
         if match is None:
             return None
-        groups = match.groupdict()
+        groups = self.get_groups(match)
         _, timestamp = timestamps.parse(groups["date"].strip("[]"))
 
-        text = Text.from_ansi(line)
-        if not text.spans:
-            text = self.highlighter(text)
+        text = highlight_line(line, self.highlighter)
         if status := groups.get("status", None):
             text.highlight_words([f" {status} "], HTTP_GROUPS.get(status[0], "magenta"))
         text.highlight_words(self.HIGHLIGHT_WORDS, "bold yellow")
 
         return timestamp, line, text
 
+    def get_groups(self, match: re.Match[str]) -> dict[str, str | None]:
+        """Get the named groups from a match."""
+        return match.groupdict()
+
 
 class CommonLogFormat(RegexLogFormat):
-    REGEX = re.compile(
-        r'(?P<ip>.*?) (?P<remote_log_name>.*?) (?P<userid>.*?) (?P<date>\[.*?(?= ).*?\]) "(?P<request_method>.*?) (?P<path>.*?)(?P<request_version> HTTP\/.*)?" (?P<status>.*?) (?P<length>.*?) "(?P<referrer>.*?)"'
-    )
+    REGEX = regex_engine.compile(COMMON_LOG_PATTERN)
+    _match = REGEX.fullmatch
 
 
 class CombinedLogFormat(RegexLogFormat):
-    REGEX = re.compile(
-        r'(?P<ip>.*?) (?P<remote_log_name>.*?) (?P<userid>.*?) \[(?P<date>.*?)(?= ) (?P<timezone>.*?)\] "(?P<request_method>.*?) (?P<path>.*?)(?P<request_version> HTTP\/.*)?" (?P<status>.*?) (?P<length>.*?) "(?P<referrer>.*?)" "(?P<user_agent>.*?)" (?P<session_id>.*?) (?P<generation_time_micro>.*?) (?P<virtual_host>.*)'
+    REGEX = regex_engine.compile(COMBINED_LOG_PATTERN)
+    _match = REGEX.fullmatch
+
+
+class CommonOrCombinedLogFormat(RegexLogFormat):
+    """Matches the Common or Combined log format with a single regex.
+
+    Groups in the Combined branch are suffixed to keep group names unique.
+    """
+
+    COMBINED_SUFFIX = "_combined"
+    REGEX = regex_engine.compile(
+        "(?:{common})|(?:{combined})".format(
+            common=COMMON_LOG_PATTERN,
+            combined=re.sub(
+                r"\(\?P<(\w+)>", rf"(?P<\1{COMBINED_SUFFIX}>", COMBINED_LOG_PATTERN
+            ),
+        )
     )
+    _match = REGEX.fullmatch
+
+    def get_groups(self, match: re.Match[str]) -> dict[str, str | None]:
+        groups = match.groupdict()
+        if groups["ip"] is not None:
+            return groups
+        suffix = self.COMBINED_SUFFIX
+        return {
+            name[: -len(suffix)]: value
+            for name, value in groups.items()
+            if name.endswith(suffix)
+        }
 
 
 class DefaultLogFormat(LogFormat):
     highlighter = LogHighlighter()
 
-    def parse(self, line: str) -> ParseResult | None:
-        text = Text.from_ansi(line)
-        if not text.spans:
-            text = self.highlighter(text)
+    def parse(self, line: str, parsed: Any = None) -> ParseResult | None:
+        text = highlight_line(line, self.highlighter)
         return None, line, text
 
 
 class JSONLogFormat(LogFormat):
     highlighter = JSONHighlighter()
+    TIMESTAMP_KEYS = ("timestamp", "ts")
+
+    def get_timestamp(self, data: Any, line: str) -> datetime | None:
+        """Get a timestamp from decoded JSON, falling back to scanning the line."""
+        if isinstance(data, dict):
+            for key in self.TIMESTAMP_KEYS:
+                value = data.get(key)
+                if isinstance(value, str):
+                    _, timestamp = timestamps.parse(value)
+                    if timestamp is not None:
+                        return timestamp
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    try:
+                        return datetime.fromtimestamp(value)
+                    except (OverflowError, OSError, ValueError):
+                        pass
+        _, timestamp = timestamps.parse(line)
+        return timestamp
 
-    def parse(self, line: str) -> ParseResult | None:
-        line = line.strip()
-        if not line:
+    def parse(self, line: str, parsed: Any = None) -> ParseResult | None:
+        if parsed is _DECODE_FAILED:
             return None
-        try:
-            json.loads(line)
-        except Exception:
-            return None
-        _, timestamp = timestamps.parse(line)
-        text = Text.from_ansi(line)
-        if not text.spans:
-            text = self.highlighter(text)
+        line = line.strip()
+        if parsed is None:
+            # Cheap check to avoid invoking the JSON parser on non-JSON lines
+            if not line.startswith(("{", "[")):
+                return None
+            try:
+                parsed = json_loads(line)
+            except Exception:
+                return None
+        timestamp = self.get_timestamp(parsed, line)
+        text = highlight_line(line, self.highlighter)
         return timestamp, line, text
 
 
@@ -109,10 +194,20 @@ class EliotLogFormat(LogFormat):
     def __init__(self):
         self._task_cache: Dict[str, Dict[str, Any]] = {}
     
-    def parse(self, line: str) -> ParseResult | None:
+    def parse(self, line: str, parsed: Any = None) -> ParseResult | None:
+        if parsed is _DECODE_FAILED:
+            return None
         try:
-            data = json.loads(line)
-            
+            if parsed is None:
+                # Eliot messages are always JSON objects
+                if not line.lstrip().startswith("{"):
+                    return None
+                data = json_loads(line)
+            else:
+                data = parsed
+            if not isinstance(data, dict):
+                return None
+
             # Check if this is an Eliot log by looking for required fields
             if not all(key in data for key in ("task_uuid", "task_level", "action_type")):
                 return None
@@ -153,8 +248,7 @@ class EliotLogFormat(LogFormat):
 FORMATS = [
     EliotLogFormat(),
     JSONLogFormat(),
-    CommonLogFormat(),
-    CombinedLogFormat(),
+    CommonOrCombinedLogFormat(),
     # DefaultLogFormat(),
 ]
 
@@ -166,17 +260,43 @@ class FormatParser:
 
     def __init__(self) -> None:
         self._formats = FORMATS.copy()
+        # Index of the format that matched the previous line, which is tried first
+        self._last_index = 0
+        # Log files often repeat lines verbatim, so cache recent parse results
+        self._cache: LRUCache[str, ParseResult] = LRUCache(maxsize=1000)
 
     def parse(self, line: str) -> ParseResult:
         """Parse a line."""
         if len(line) > 10_000:
             line = line[:10_000]
+        try:
+            return self._cache[line]
+        except KeyError:
+            pass
+        parse_result = self._parse(line)
+        self._cache[line] = parse_result
+        return parse_result
+
+    def _parse(self, line: str) -> ParseResult:
         if line.strip():
-            for index, format in enumerate(self._formats):
-                parse_result = format.parse(line)
+            # Decode JSON once, up front, rather than in each JSON based format
+            parsed = None
+            if line.lstrip().startswith(("{", "[")):
+                try:
+                    parsed = json_loads(line)
+                except Exception:
+                    parsed = _DECODE_FAILED
+            formats = self._formats
+            last_index = self._last_index
+            parse_result = formats[last_index].parse(line, parsed)
+            if parse_result is not None:
+                return parse_result
+            for index, format in enumerate(formats):
+                if index == last_index:
+                    continue
+                parse_result = format.parse(line, parsed)
                 if parse_result is not None:
-                    if index:
-                        self._formats = [*self._formats[index:], *self._formats[:index]]
+                    self._last_index = index
                     return parse_result
         parse_result = default_log_format.parse(line)
         if parse_result is not None:
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data: str | bytes) -> Any:
+    """Decode JSON, using orjson if it is installed.
+
+    orjson rejects some documents the json module accepts (such as `NaN`, or
+    integers wider than 64 bits), so those are retried with the json module.
+
+    Raises:
+        json.JSONDecodeError: If the data isn't valid JSON.
+    """
+    if orjson is None:
+        return json.loads(data)
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        return json.loads(data)
@@ -44,7 +44,7 @@ import time
 from datetime import datetime, timedelta
 from typing import Iterable, Literal, Mapping
 
-SPLIT_REGEX = r"[\s/\[\]\(\)\"\/]"
+SPLIT_REGEX = re.compile(r"[\s/\[\]\(\)\"\/]")
 
 MAX_LINE_LENGTH = 1000
 
@@ -116,7 +116,7 @@ class SearchSuggester(Suggester):
         super().__init__(use_cache=False, case_sensitive=True)
 
     async def get_suggestion(self, value: str) -> str | None:
-        word = re.split(SPLIT_REGEX, value)[-1]
+        word = SPLIT_REGEX.split(value)[-1]
         start = value[: -len(word)]
 
         if not word:
@@ -620,7 +620,7 @@ class LogLines(ScrollView, inherit_bindings=False):
 
             search_index = self._search_index
 
-            for word in re.split(SPLIT_REGEX, text.plain):
+            for word in SPLIT_REGEX.split(text.plain):
                 if len(word) <= 1:
                     continue
                 for offset in range(1, len(word) - 1):
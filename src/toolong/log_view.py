@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, tzinfo
+import os
 from textual import on
 from textual.app import ComposeResult
 from textual.binding import Binding
@@ -9,11 +10,13 @@ from textual.containers import Horizontal
 from textual.dom import NoScreen
 from textual import events
 from textual.reactive import reactive
+from textual.timer import Timer
 from textual.widget import Widget
 from textual.widgets import Label
-from asyncio import Lock
 import json
 
+from toolong.json_decode import json_loads
+
 from toolong.messages import (
     DismissOverlay,
     Goto,
@@ -29,8 +32,58 @@ from toolong.log_lines import LogLines
 from toolong.eliot_view import EliotView
 from toolong.scan_progress_bar import ScanProgressBar
 
-SPLIT_REGEX = r"[\s/\[\]]"
 MAX_DETAIL_LINE_LENGTH = 100_000
+PENDING_LINES_INTERVAL = 0.1
+ELIOT_KEYS = ("task_uuid", "task_level", "action_type")
+ELIOT_SNIFF_SIZE = 4096
+MAX_ELIOT_LINE_LENGTH = 1024 * 1024
+
+
+def is_eliot_log(line: str | bytes) -> bool:
+    """Check if a line is an Eliot log entry.
+
+    Bytes are decoded directly, which is the fast path for orjson.
+    """
+    try:
+        data = json_loads(line)
+        return all(key in data for key in ELIOT_KEYS)
+    except (json.JSONDecodeError, UnicodeDecodeError, TypeError):
+        return False
+
+
+def is_eliot_file(path: str) -> bool:
+    """Check if the first line of a file is an Eliot log entry.
+
+    Reads raw bytes, and only decodes JSON if the Eliot keys are present in the first
+    line. First lines longer than `MAX_ELIOT_LINE_LENGTH` are rejected.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        data = os.read(fd, ELIOT_SNIFF_SIZE)
+        if data and b"\n" not in data:
+            # The first line is long, so read the rest of it, up to a limit.
+            # Eliot writes its own keys last, so they may be beyond the sniffed bytes.
+            buffer = bytearray(data)
+            while b"\n" not in data:
+                if len(buffer) > MAX_ELIOT_LINE_LENGTH:
+                    return False
+                data = os.read(fd, 64 * 1024)
+                if not data:
+                    break
+                buffer += data
+            data = bytes(buffer)
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+    first_line = data.partition(b"\n")[0].strip()
+    if not all(key.encode() in first_line for key in ELIOT_KEYS):
+        return False
+    return is_eliot_log(first_line)
+
 
 class InfoOverlay(Widget):
     """Displays text under the lines widget when there are new lines."""
@@ -70,17 +123,23 @@ class InfoOverlay(Widget):
     message = reactive("")
     tail = reactive(False)
 
+    def __init__(self) -> None:
+        self._label: Label | None = None
+        super().__init__()
+
     def compose(self) -> ComposeResult:
         self.tooltip = "Click to tail file"
         with Horizontal():
-            yield Label("")
+            self._label = Label("")
+            yield self._label
 
     def watch_message(self, message: str) -> None:
         self.display = bool(message.strip())
-        self.query_one(Label).update(message)
+        if self._label is not None:
+            self._label.update(message)
 
     def watch_tail(self, tail: bool) -> None:
-        if not tail:
+        if not tail and self.message:
             self.message = ""
         self.display = bool(self.message.strip() and not tail)
 
@@ -110,6 +169,11 @@ class FooterKey(Label):
         self.description = description
         super().__init__()
 
+    @property
+    def key_tuple(self) -> tuple[str, str, str]:
+        """The key, key display, and description."""
+        return (self.key, self.key_display, self.description)
+
     def render(self) -> str:
         return f"[reverse]{self.key_display}[/reverse] {self.description}"
 
@@ -176,13 +240,20 @@ class LogFooter(Widget):
     can_tail: reactive[bool] = reactive(False)
 
     def __init__(self) -> None:
-        self.lock = Lock()
+        self._mounting = False
+        self._remount_pending = False
+        self._keys: tuple[tuple[str, str, str], ...] = ()
+        self._meta_dirty = False
+        self._meta_line = ""
+        self._timestamp_cache: tuple[tuple[datetime, tzinfo | None], str] | None = None
+        self._tail_label: Label | None = None
         super().__init__()
 
     def compose(self) -> ComposeResult:
         with Horizontal(classes="key-container"):
             pass
-        yield Label("TAIL", classes="tail")
+        self._tail_label = Label("TAIL", classes="tail")
+        yield self._tail_label
         yield MetaLabel("", classes="meta")
 
     async def mount_keys(self) -> None:
@@ -191,60 +262,99 @@ class LogFooter(Widget):
                 return
         except NoScreen:
             pass
-        async with self.lock:
-            with self.app.batch_update():
-                key_container = self.query_one(".key-container")
-                await key_container.query("*").remove()
-                bindings = [
-                    binding
-                    for (_, binding) in self.app.namespace_bindings.values()
-                    if binding.show
-                ]
-
-                await key_container.mount_all(
-                    [
-                        FooterKey(
-                            binding.key,
-                            binding.key_display or binding.key,
-                            binding.description,
-                        )
-                        for binding in bindings
-                        if binding.action != "toggle_tail"
-                        or (binding.action == "toggle_tail" and self.can_tail)
-                    ]
-                )
+        if self._mounting:
+            # Already mounting, so update again when that has finished
+            self._remount_pending = True
+            return
+        self._mounting = True
+        try:
+            self._remount_pending = True
+            while self._remount_pending:
+                self._remount_pending = False
+                await self._update_keys()
+        finally:
+            self._mounting = False
+
+    async def _update_keys(self) -> None:
+        """Update the footer keys to match the current bindings."""
+        can_tail = self.can_tail
+        keys = tuple(
+            (binding.key, binding.key_display or binding.key, binding.description)
+            for (_, binding) in self.app.namespace_bindings.values()
+            if binding.show and (can_tail or binding.action != "toggle_tail")
+        )
+        if keys == self._keys:
+            return
+        with self.app.batch_update():
+            key_container = self.query_one(".key-container")
+            # Remove keys which are no longer bound, and insert new keys in order
+            new_keys = set(keys)
+            for footer_key in key_container.query(FooterKey):
+                if footer_key.key_tuple not in new_keys:
+                    await footer_key.remove()
+            current_keys = {
+                footer_key.key_tuple for footer_key in key_container.query(FooterKey)
+            }
+            for index, key in enumerate(keys):
+                if key not in current_keys:
+                    footer_key = FooterKey(*key)
+                    if index < len(key_container.children):
+                        await key_container.mount(footer_key, before=index)
+                    else:
+                        await key_container.mount(footer_key)
+            self._keys = keys
 
     async def on_mount(self):
         self.watch(self.screen, "focused", self.mount_keys)
         self.watch(self.screen, "stack_updates", self.mount_keys)
         self.call_after_refresh(self.mount_keys)
 
+    def refresh_meta(self) -> None:
+        """Update the meta information after the next refresh.
+
+        Coalesces changes to several reactives into a single update.
+        """
+        if not self._meta_dirty:
+            self._meta_dirty = True
+            self.call_after_refresh(self.update_meta)
+
+    def format_timestamp(self, timestamp: datetime) -> str:
+        """Format a timestamp for the meta line, reusing the last result if in the same second."""
+        key = (timestamp.replace(microsecond=0), timestamp.tzinfo)
+        if self._timestamp_cache is None or self._timestamp_cache[0] != key:
+            self._timestamp_cache = (key, f"{timestamp:%x %X}")
+        return self._timestamp_cache[1]
+
     def update_meta(self) -> None:
-        meta: list[str] = []
+        self._meta_dirty = False
+        timestamp = "" if self.timestamp is None else self.format_timestamp(self.timestamp)
+        line_no = "" if self.line_no is None else str(self.line_no + 1)
         if self.filename:
-            meta.append(self.filename)
-        if self.timestamp is not None:
-            meta.append(f"{self.timestamp:%x %X}")
-        if self.line_no is not None:
-            meta.append(f"{self.line_no + 1}")
-
-        meta_line = " • ".join(meta)
-        self.query_one(".meta", Label).update(meta_line)
+            meta_line = " • ".join(filter(None, (self.filename, timestamp, line_no)))
+        elif timestamp and line_no:
+            # The common case of a single file
+            meta_line = f"{timestamp} • {line_no}"
+        else:
+            meta_line = timestamp or line_no
+        if meta_line != self._meta_line:
+            self._meta_line = meta_line
+            self.query_one(".meta", Label).update(meta_line)
 
     def watch_tail(self, tail: bool) -> None:
-        self.query(".tail").set_class(tail and self.can_tail, "on")
+        if self._tail_label is not None:
+            self._tail_label.set_class(tail and self.can_tail, "on")
 
     async def watch_can_tail(self, can_tail: bool) -> None:
         await self.mount_keys()
 
     def watch_filename(self, filename: str) -> None:
-        self.update_meta()
+        self.refresh_meta()
 
     def watch_line_no(self, line_no: int | None) -> None:
-        self.update_meta()
+        self.refresh_meta()
 
     def watch_timestamp(self, timestamp: datetime | None) -> None:
-        self.update_meta()
+        self.refresh_meta()
 
 class LogView(Horizontal):
     """Widget that contains log lines and associated widgets."""
@@ -280,36 +390,47 @@ class LogView(Horizontal):
     tail: reactive[bool] = reactive(False)
     can_tail: reactive[bool] = reactive(True)
 
-    def __init__(self, file_paths: list[str], watcher: WatcherBase, can_tail: bool = True) -> None:
+    def __init__(
+        self,
+        file_paths: list[str],
+        watcher: WatcherBase,
+        can_tail: bool = True,
+        is_eliot: bool | None = None,
+    ) -> None:
+        """
+        Args:
+            file_paths: Paths of log files to display.
+            watcher: Watcher for file changes.
+            can_tail: Enable tailing.
+            is_eliot: Whether the files are Eliot logs, or `None` to check the files.
+        """
         super().__init__()
         self.file_paths = file_paths
         self.watcher = watcher
         self.eliot_view: EliotView | None = None
         self.can_tail = can_tail
-
-    def _is_eliot_log(self, line: str) -> bool:
-        """Check if a line is an Eliot log entry."""
-        try:
-            data = json.loads(line)
-            return all(key in data for key in ("task_uuid", "task_level", "action_type"))
-        except (json.JSONDecodeError, KeyError):
-            return False
+        self.is_eliot = is_eliot
+        self._progress_bar: ScanProgressBar | None = None
+        self._log_lines: LogLines | None = None
+        self._line_panel: LinePanel | None = None
+        self._find_dialog: FindDialog | None = None
+        self._info_overlay: InfoOverlay | None = None
+        self._log_footer: LogFooter | None = None
+        self._multi_file = False
+        self._is_view_focused: bool | None = None
+        self._pending_count = 0
+        self._pending_timer: Timer | None = None
+        self._panel_line: tuple[int, int] | None = None
 
     def compose(self) -> ComposeResult:
         """Create child widgets."""
-        yield ScanProgressBar()
-
-        # Check first line of each file to determine if it's an Eliot log
-        is_eliot = False
-        for path in self.file_paths:
-            try:
-                with open(path) as f:
-                    first_line = f.readline().strip()
-                    if first_line and self._is_eliot_log(first_line):
-                        is_eliot = True
-                        break
-            except (IOError, OSError):
-                continue
+        self._progress_bar = ScanProgressBar()
+        yield self._progress_bar
+
+        is_eliot = self.is_eliot
+        if is_eliot is None:
+            # Check first line of each file to determine if it's an Eliot log
+            is_eliot = any(is_eliot_file(path) for path in self.file_paths)
 
         if is_eliot:
             # For Eliot logs, use only the tree view
@@ -318,22 +439,29 @@ class LogView(Horizontal):
             yield self.eliot_view
         else:
             # For regular logs, use the full log view functionality
-            log_lines = LogLines(self.watcher, self.file_paths)
+            # Keep references to child widgets, to avoid querying in event handlers
+            self._log_lines = log_lines = LogLines(self.watcher, self.file_paths)
+            # The files are fixed for the life of the view
+            self._multi_file = len(log_lines.log_files) > 1
             yield log_lines.data_bind(
                 LogView.tail,
                 LogView.show_line_numbers,
                 LogView.show_find,
                 LogView.can_tail,
             )
-            yield LinePanel()
-            yield FindDialog(log_lines._suggester)
-            yield InfoOverlay().data_bind(LogView.tail)
-            yield LogFooter().data_bind(LogView.tail, LogView.can_tail)
+            self._line_panel = LinePanel()
+            yield self._line_panel
+            self._find_dialog = FindDialog(log_lines._suggester)
+            yield self._find_dialog
+            self._info_overlay = InfoOverlay()
+            yield self._info_overlay.data_bind(LogView.tail)
+            self._log_footer = LogFooter()
+            yield self._log_footer.data_bind(LogView.tail, LogView.can_tail)
 
     @on(FindDialog.Update)
     def filter_dialog_update(self, event: FindDialog.Update) -> None:
         if not self.eliot_view:
-            log_lines = self.query_one(LogLines)
+            log_lines = self._log_lines
             log_lines.find = event.find
             log_lines.regex = event.regex
             log_lines.case_sensitive = event.case_sensitive
@@ -341,16 +469,19 @@ class LogView(Horizontal):
     async def watch_show_find(self, show_find: bool) -> None:
         if not self.is_mounted or self.eliot_view:
             return
-        filter_dialog = self.query_one(FindDialog)
+        filter_dialog = self._find_dialog
         filter_dialog.display = show_find
         if show_find:
             filter_dialog.focus_input()
         else:
-            self.query_one(LogLines).focus()
+            self._log_lines.focus()
 
     async def watch_show_panel(self, show_panel: bool) -> None:
         if not self.eliot_view:
             self.set_class(show_panel, "show-panel")
+            if not show_panel:
+                # Hidden panels aren't updated, so render again when shown
+                self._panel_line = None
             await self.update_panel()
 
     @on(FindDialog.Dismiss)
@@ -363,7 +494,7 @@ class LogView(Horizontal):
     def move_pointer(self, event: FindDialog.MovePointer) -> None:
         if not self.eliot_view:
             event.stop()
-            self.query_one(LogLines).advance_search(event.direction)
+            self._log_lines.advance_search(event.direction)
 
     @on(FindDialog.SelectLine)
     def select_line(self) -> None:
@@ -378,7 +509,7 @@ class LogView(Horizontal):
             elif self.show_panel:
                 self.show_panel = False
             else:
-                setattr(self.query_one(LogLines), 'pointer_line', None)
+                self._log_lines.pointer_line = None
 
     @on(TailFile)
     def on_tail_file(self, event: TailFile) -> None:
@@ -389,10 +520,14 @@ class LogView(Horizontal):
     async def update_panel(self) -> None:
         if not self.show_panel or self.eliot_view is not None:
             return
-        pointer_line = self.query_one(LogLines).pointer_line
+        log_lines = self._log_lines
+        pointer_line = log_lines.pointer_line
         if pointer_line is not None:
-            panel = self.query_one(LinePanel)
-            log_lines = self.query_one(LogLines)
+            # The line count is included, as new lines may shift a merged view
+            panel_line = (pointer_line, log_lines.line_count)
+            if panel_line == self._panel_line:
+                return
+            panel = self._line_panel
             line, text, timestamp = log_lines.get_text(
                 pointer_line,
                 block=True,
@@ -400,6 +535,7 @@ class LogView(Horizontal):
                 max_line_length=MAX_DETAIL_LINE_LENGTH,
             )
             await panel.update(line, text, timestamp)
+            self._panel_line = panel_line
 
     @on(PointerMoved)
     async def pointer_moved(self, event: PointerMoved):
@@ -409,47 +545,64 @@ class LogView(Horizontal):
             if self.show_panel:
                 await self.update_panel()
 
-            log_lines = self.query_one(LogLines)
+            log_lines = self._log_lines
             pointer_line = log_lines.scroll_offset.y if event.pointer_line is None else event.pointer_line
-            log_file, _, _ = log_lines.index_to_span(pointer_line)
-            log_footer = self.query_one(LogFooter)
-            log_footer.line_no = pointer_line
-            if len(log_lines.log_files) > 1:
-                log_footer.filename = log_file.name
-            log_footer.timestamp = log_lines.get_timestamp(pointer_line)
+            log_footer = self._log_footer
+            with self.app.batch_update():
+                log_footer.line_no = pointer_line
+                if self._multi_file:
+                    log_file, _, _ = log_lines.index_to_span(pointer_line)
+                    if log_file.name != log_footer.filename:
+                        log_footer.filename = log_file.name
+                log_footer.timestamp = log_lines.get_timestamp(pointer_line)
 
     @on(PendingLines)
     def on_pending_lines(self, event: PendingLines) -> None:
         if not self.eliot_view and not self.tail:
-            info = self.query_one(InfoOverlay)
-            info.message = f"{event.count} new line{'s' if event.count > 1 else ''}"
+            # Update the overlay at most every PENDING_LINES_INTERVAL seconds
+            self._pending_count = event.count
+            if self._pending_timer is None:
+                self._pending_timer = self.set_timer(
+                    PENDING_LINES_INTERVAL, self._update_pending_lines
+                )
+
+    def _update_pending_lines(self) -> None:
+        self._pending_timer = None
+        if self.tail:
+            return
+        count = self._pending_count
+        info = self._info_overlay
+        info.message = f"{count} new line{'s' if count > 1 else ''}"
 
     @on(ScanComplete)
     async def on_scan_complete(self, event: ScanComplete) -> None:
-        try:
-            progress_bar = self.query_one(ScanProgressBar)
-            if progress_bar is not None:
-                progress_bar.remove()
-        except Exception:
-            pass  # Progress bar might already be removed
+        if self._progress_bar is not None:
+            self._progress_bar.remove()
+            self._progress_bar = None
 
         if self.eliot_view is not None:
             self.eliot_view.tree.loading = False
             self.eliot_view.tree.remove_class("-scanning")
         else:
-            log_lines = self.query_one(LogLines)
+            log_lines = self._log_lines
             log_lines.loading = False
             log_lines.remove_class("-scanning")
             self.post_message(PointerMoved(log_lines.pointer_line))
             self.tail = True
-            self.query_one(LogFooter).can_tail = True
+            self._log_footer.can_tail = True
 
     @on(events.DescendantFocus)
     @on(events.DescendantBlur)
     def on_descendant_focus(self, event: events.DescendantBlur) -> None:
         focused = self.screen.focused
+        is_view_focused = isinstance(
+            focused, (LogLines if not self.eliot_view else EliotView)
+        )
+        if is_view_focused == self._is_view_focused:
+            return
+        self._is_view_focused = is_view_focused
         self.set_class(
-            isinstance(focused, (LogLines if not self.eliot_view else EliotView)),
+            is_view_focused,
             "lines-view" if not self.eliot_view else "tree-view"
         )
 
@@ -464,4 +617,4 @@ class LogView(Horizontal):
     def action_goto(self) -> None:
         if not self.eliot_view:
             from toolong.goto_screen import GotoScreen
-            self.app.push_screen(GotoScreen(self.query_one(LogLines)))
\ No newline at end of file
+            self.app.push_screen(GotoScreen(self._log_lines))
\ No newline at end of file
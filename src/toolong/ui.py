@@ -1,6 +1,9 @@
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import locale
+import os
 from pathlib import Path
 
 from rich import terminal_theme
@@ -11,13 +14,15 @@ from textual.screen import Screen
 from textual.widgets import TabbedContent, TabPane
 from textual.css.query import NoMatches
 
-from toolong.log_view import LogView
+from toolong.log_view import LogView, is_eliot_file
 from toolong.watcher import get_watcher
 from toolong.help import HelpScreen
 
 
 locale.setlocale(locale.LC_ALL, "")
 
+MAX_DETECT_WORKERS = 32
+
 
 class LogScreen(Screen):
     """Shows log files."""
@@ -45,18 +50,24 @@ class LogScreen(Screen):
         """Create child widgets."""
         assert isinstance(self.app, UI)
         with TabbedContent():
-            if len(self.app.file_paths) > 1:
+            eliot_map = self.app.eliot_map
+            multiple_files = len(self.app.file_paths) > 1
+            if multiple_files:
                 with TabPane("All"):
                     yield LogView(
                         self.app.file_paths,
                         self.app.watcher,
+                        is_eliot=any(eliot_map.values()),
                     )
             for path in self.app.file_paths:
                 with TabPane(path):
-                    yield LogView(
+                    log_view = LogView(
                         [path],
                         self.app.watcher,
+                        is_eliot=eliot_map[path],
                     )
+                    # Only the "All" tab is active, so file tabs may mount after it
+                    yield Lazy(log_view) if multiple_files else log_view
 
     async def on_mount(self) -> None:
         """Handle mount."""
@@ -76,31 +87,15 @@ class LogScreen(Screen):
         self.app.push_screen(HelpScreen())
 
 
-from functools import total_ordering
-
-
-@total_ordering
-class CompareTokens:
-    """Compare filenames."""
+def path_sort_key(path: str) -> tuple[tuple[int, int | str], ...]:
+    """Get a key to naturally sort filenames, so that numbered files sort numerically.
 
-    def __init__(self, path: str) -> None:
-        self.tokens = [
-            int(token) if token.isdigit() else token.lower()
-            for token in path.split("/")[-1].split(".")
-        ]
-
-    def __eq__(self, other: object) -> bool:
-        return self.tokens == other.tokens
-
-    def __lt__(self, other: CompareTokens) -> bool:
-        for token1, token2 in zip(self.tokens, other.tokens):
-            try:
-                if token1 < token2:
-                    return True
-            except TypeError:
-                if str(token1) < str(token2):
-                    return True
-        return len(self.tokens) < len(other.tokens)
+    Numbers sort before other tokens.
+    """
+    return tuple(
+        (0, int(token)) if token.isdecimal() else (1, token.lower())
+        for token in os.path.basename(path).split(".")
+    )
 
 
 class UI(App):
@@ -108,7 +103,19 @@ class UI(App):
 
     @classmethod
     def sort_paths(cls, paths: list[str]) -> list[str]:
-        return sorted(paths, key=CompareTokens)
+        return sorted(paths, key=path_sort_key)
+
+    @classmethod
+    def detect_eliot(cls, paths: list[str]) -> dict[str, bool]:
+        """Check which files are Eliot logs.
+
+        Files are read concurrently, so that waiting on the disk overlaps.
+        """
+        if len(paths) <= 1:
+            return {path: is_eliot_file(path) for path in paths}
+        max_workers = min(MAX_DETECT_WORKERS, len(paths))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(paths, executor.map(is_eliot_file, paths)))
 
     def __init__(
         self, file_paths: list[str], merge: bool = False, save_merge: str | None = None
@@ -117,19 +124,17 @@ class UI(App):
         self.merge = merge
         self.save_merge = save_merge
         self.watcher = get_watcher()
+        self.eliot_map: dict[str, bool] = {}
         super().__init__()
 
     async def on_mount(self) -> None:
         self.ansi_theme_dark = terminal_theme.DIMMED_MONOKAI
-        await self.push_screen(LogScreen())
-        try:
-            self.screen.query_one("LogLines").focus()
-        except NoMatches:
-            try:
-                self.screen.query_one("EliotTree").focus()
-            except NoMatches:
-                pass
         self.watcher.start()
+        # Detect Eliot logs once, rather than in every view that shows a file
+        self.eliot_map = await asyncio.get_running_loop().run_in_executor(
+            None, self.detect_eliot, self.file_paths
+        )
+        await self.push_screen(LogScreen())
 
     def on_unmount(self) -> None:
         self.watcher.close()